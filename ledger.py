@@ -2,15 +2,93 @@
 Ledger module for managing SQLite-based immutable records.
 
 This module provides functions to initialize SQLite databases as append-only ledgers
-and add records to them. Each record gets a timestamp and unique identifier to ensure
-immutability and ordering.
+and add records to them, either one at a time or in batches. Each record gets a
+timestamp and unique identifier to ensure immutability and ordering.
 """
 
 import sqlite3
 import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
+from merkle import TWIG_SIZE, get_hash_algorithm, seal_twigs
 
-def init_db(db_file: str) -> sqlite3.Connection:
+
+_LEDGER_TABLE_SQL = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp REAL NOT NULL,
+        data TEXT NOT NULL,
+        hash BLOB NOT NULL
+    )
+"""
+
+
+# Every insert goes through this one statement, so the connection's statement
+# cache prepares it once and reuses it for each batch
+_INSERT_SQL = "INSERT INTO ledger (timestamp, data, hash) VALUES (?, ?, ?)"
+
+
+def _ledger_hash_algo(conn: sqlite3.Connection, requested: Optional[str]) -> str:
+    """
+    Get the ledger's Merkle hash algorithm, recording it if not set yet.
+    
+    Ledgers that already hold records without a recorded algorithm were
+    built with SHA256. Empty ledgers take the requested algorithm.
+    
+    Args:
+        conn: SQLite database connection
+        requested: The algorithm asked for by the caller, if any
+        
+    Returns:
+        str: Name of the ledger's hash algorithm
+    """
+    row = conn.execute("SELECT value FROM ledger_meta WHERE key = 'hash_algo'").fetchone()
+    if row:
+        return row[0]
+    
+    has_records = conn.execute("SELECT EXISTS (SELECT 1 FROM ledger)").fetchone()[0]
+    algo = 'sha256' if has_records else (requested or 'sha256')
+    conn.execute("INSERT INTO ledger_meta (key, value) VALUES ('hash_algo', ?)", (algo,))
+    return algo
+
+
+def _migrate_text_hashes(conn: sqlite3.Connection):
+    """
+    Rewrite a ledger that stores hex TEXT hashes to store 32-byte BLOBs.
+    
+    The table is rebuilt under the same IDs, so record order and Merkle
+    roots are unchanged. Does nothing for new or already migrated ledgers.
+    
+    Args:
+        conn: SQLite database connection
+    """
+    columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(ledger)")}
+    if columns.get("hash", "").upper() != "TEXT":
+        return
+    
+    # unhex() only exists from SQLite 3.41, so decode in Python
+    conn.create_function("ledger_unhex", 1, bytes.fromhex, deterministic=True)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("ALTER TABLE ledger RENAME TO ledger_old")
+        conn.execute(_LEDGER_TABLE_SQL.format(name="ledger"))
+        conn.execute("""
+            INSERT INTO ledger (id, timestamp, data, hash)
+            SELECT id, timestamp, data, ledger_unhex(hash)
+            FROM ledger_old
+            ORDER BY id
+        """)
+        # Dropping the old table also drops its hash index
+        conn.execute("DROP TABLE ledger_old")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def init_db(db_file: str, hash_algo: Optional[str] = None,
+            index_hash: bool = False) -> sqlite3.Connection:
     """
     Initialize a SQLite database with a ledger table.
     
@@ -18,35 +96,131 @@ def init_db(db_file: str) -> sqlite3.Connection:
     - id: auto-incrementing primary key (ensures ordering)
     - timestamp: Unix timestamp when record was added
     - data: the actual record content
-    - hash: SHA256 hash of the record for integrity
+    - hash: 32-byte SHA256 digest of the record for integrity
+    
+    Ledgers created with hex TEXT hashes are migrated to BLOB hashes on open.
+    
+    A ledger_meta table records which Merkle hash algorithm the ledger uses.
+    The algorithm is fixed when the ledger is created (SHA256 unless
+    hash_algo says otherwise), so a ledger's roots stay reproducible.
+    
+    A merkle_twigs table caches the Merkle root of every complete block of
+    TWIG_SIZE records, so roots can be computed without rescanning the whole
+    ledger. Twigs missing from an existing ledger are sealed on open.
+    
+    The connection is switched to WAL journaling with synchronous=NORMAL, so
+    each commit is a sequential append to the write-ahead log instead of a
+    pair of rollback-journal fsyncs, and readers don't block the writer.
     
     Args:
         db_file: Path to the SQLite database file
+        hash_algo: Merkle hash algorithm for a new ledger ('sha256' or
+            'blake3'); if given for an existing ledger it must match
+        index_hash: Create an index on the record hash for lookups by hash.
+            Off by default since nothing here queries by hash and every
+            insert would pay for maintaining it
         
     Returns:
         sqlite3.Connection: Connection to the initialized database
+    
+    Raises:
+        sqlite3.OperationalError: If the database cannot be switched to WAL mode
+        ValueError: If hash_algo or the ledger's algorithm is unknown, or
+            hash_algo differs from the ledger's
+        RuntimeError: If hash_algo or the ledger's algorithm needs an
+            optional package that is missing
     """
+    if hash_algo is not None:
+        get_hash_algorithm(hash_algo)
+    
     conn = sqlite3.connect(db_file)
     
+    # Tune the connection for an append-heavy workload
+    journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    # In-memory databases can't use WAL and report 'memory' instead
+    if journal_mode.lower() not in ("wal", "memory"):
+        conn.close()
+        raise sqlite3.OperationalError(
+            f"Could not enable WAL journal mode for {db_file} (got '{journal_mode}')"
+        )
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=1073741824")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA busy_timeout=3000")
+    
+    # Convert ledgers created with hex TEXT hashes before touching the schema
+    _migrate_text_hashes(conn)
+    
     # Create the ledger table
+    conn.execute(_LEDGER_TABLE_SQL.format(name="IF NOT EXISTS ledger"))
+    
+    # Create index on hash for faster lookups, only when asked for
+    if index_hash:
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ledger_hash ON ledger(hash)
+        """)
+    
+    # Record the ledger's Merkle hash algorithm
     conn.execute("""
-        CREATE TABLE IF NOT EXISTS ledger (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp REAL NOT NULL,
-            data TEXT NOT NULL,
-            hash TEXT NOT NULL
+        CREATE TABLE IF NOT EXISTS ledger_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
         )
     """)
+    stored_algo = _ledger_hash_algo(conn, hash_algo)
+    if hash_algo is not None and hash_algo != stored_algo:
+        conn.close()
+        raise ValueError(
+            f"Ledger {db_file} uses the '{stored_algo}' hash algorithm, not '{hash_algo}'"
+        )
+    
+    # An existing ledger may use an algorithm this machine can't load
+    try:
+        get_hash_algorithm(stored_algo)
+    except (ValueError, RuntimeError):
+        conn.close()
+        raise
     
-    # Create index on hash for faster lookups
+    # Create the Merkle twig cache
     conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_ledger_hash ON ledger(hash)
+        CREATE TABLE IF NOT EXISTS merkle_twigs (
+            twig_id INTEGER PRIMARY KEY,
+            root BLOB NOT NULL,
+            last_id INTEGER NOT NULL
+        )
     """)
+    seal_twigs(conn)
     
     conn.commit()
     return conn
 
 
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    Group several ledger writes into one atomic transaction.
+    
+    A plain `with conn:` block does not start a transaction under the
+    default isolation level, so each add_record inside it would still commit
+    on its own. This opens one explicitly with BEGIN IMMEDIATE, commits when
+    the block exits and rolls everything back if it raises.
+    
+    Args:
+        conn: SQLite database connection with no transaction open
+        
+    Yields:
+        sqlite3.Connection: The same connection
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
 def add_record(conn: sqlite3.Connection, data: str) -> int:
     """
     Add a new record to the ledger.
@@ -55,6 +229,11 @@ def add_record(conn: sqlite3.Connection, data: str) -> int:
     1. Generating a timestamp
     2. Computing a hash of the data
     3. Inserting into the ledger table
+    4. Sealing the Merkle twig the record completes, if any
+    
+    The insert is committed immediately unless the caller already holds an
+    open transaction (see transaction()), in which case committing is left
+    to the caller. It shares add_records' single insert statement.
     
     Args:
         conn: SQLite database connection
@@ -63,38 +242,117 @@ def add_record(conn: sqlite3.Connection, data: str) -> int:
     Returns:
         int: The ID of the inserted record
     """
+    return add_records(conn, [data])[0]
+
+
+def add_records(conn: sqlite3.Connection, datas: list[str]) -> list[int]:
+    """
+    Add several records to the ledger in a single transaction.
+    
+    All rows are hashed up front and inserted with one executemany call, so
+    the whole batch costs a single commit instead of one per record. As with
+    add_record, an already-open transaction (see transaction()) is left for
+    the caller to commit.
+    
+    The clock is read once per batch and every record in it shares that
+    timestamp; ordering within a batch is carried by the record IDs.
+    
+    Args:
+        conn: SQLite database connection
+        datas: The data items to store, in ledger order
+        
+    Returns:
+        list[int]: The IDs of the inserted records, in the same order
+    """
     import hashlib
     
+    if not datas:
+        return []
+    
+    owns_transaction = not conn.in_transaction
+    # A nanosecond stride per row would round away at epoch-sized doubles,
+    # so the batch shares one reading of the clock
     timestamp = time.time()
+    rows = [
+        (timestamp, data, hashlib.sha256(data.encode('utf-8')).digest())
+        for data in datas
+    ]
     
-    # Create hash of the data for integrity
-    record_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+    try:
+        conn.executemany(_INSERT_SQL, rows)
+        # The batch holds the write lock, so its AUTOINCREMENT IDs are contiguous
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        
+        # Seal any twigs the batch completes
+        if last_id // TWIG_SIZE > (last_id - len(rows)) // TWIG_SIZE:
+            seal_twigs(conn)
+    except BaseException:
+        # Sealing can fail outside SQLite too (a broken worker pool, an
+        # interrupt), and the transaction must not be left open either way
+        if owns_transaction:
+            conn.rollback()
+        raise
     
-    cursor = conn.execute("""
-        INSERT INTO ledger (timestamp, data, hash)
-        VALUES (?, ?, ?)
-    """, (timestamp, data, record_hash))
+    if owns_transaction:
+        conn.commit()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def iter_records(conn: sqlite3.Connection) -> Iterator[tuple]:
+    """
+    Iterate over all records in the ledger in order.
     
-    conn.commit()
-    return cursor.lastrowid
+    Rows are streamed from the cursor one at a time, so the ledger is never
+    materialized in memory.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Yields:
+        tuple: (id, timestamp, data, hash) for each record, with the hash
+        as a 32-byte digest
+    """
+    yield from conn.execute("""
+        SELECT id, timestamp, data, hash
+        FROM ledger
+        ORDER BY id
+    """)
 
 
 def get_all_records(conn: sqlite3.Connection) -> list[tuple]:
     """
     Retrieve all records from the ledger in order.
     
+    Prefer iter_records when the records are only needed one at a time.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        list[tuple]: List of (id, timestamp, data, hash) tuples, with the
+        hash as a 32-byte digest
+    """
+    return list(iter_records(conn))
+
+
+def get_latest_records(conn: sqlite3.Connection, limit: int) -> list[str]:
+    """
+    Retrieve the data of the most recent records, oldest first.
+    
     Args:
         conn: SQLite database connection
+        limit: Maximum number of records to return
         
     Returns:
-        list[tuple]: List of (id, timestamp, data, hash) tuples
+        list[str]: Data of the last `limit` records in ledger order
     """
     cursor = conn.execute("""
-        SELECT id, timestamp, data, hash
+        SELECT data
         FROM ledger
-        ORDER BY id
-    """)
-    return cursor.fetchall()
+        ORDER BY id DESC
+        LIMIT ?
+    """, (limit,))
+    return [data for (data,) in cursor.fetchall()[::-1]]
 
 
 def get_record_count(conn: sqlite3.Connection) -> int:
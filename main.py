@@ -7,8 +7,8 @@ to demonstrate the complete functionality of the distributed immutable ledger sy
 
 import os
 import sqlite3
-from ledger import init_db, add_record, get_all_records, get_record_count
-from merkle import sha256, compute_merkle_root, merkle_root, get_merkle_path
+from ledger import init_db, add_record, add_records, iter_records, get_record_count
+from merkle import sha256, compute_merkle_root, merkle_root, get_merkle_path, short_hash
 from node import Node, compare_network
 
 
@@ -30,19 +30,18 @@ def demo_ledger_operations():
     ]
     
     print("\n📝 Adding records to ledger:")
-    for i, data in enumerate(records, 1):
-        record_id = add_record(conn, data)
+    record_ids = add_records(conn, records)
+    for i, (record_id, data) in enumerate(zip(record_ids, records), 1):
         print(f"   {i}. Added record {record_id}: {data}")
     
     # Display all records
     print(f"\n📊 Total records in ledger: {get_record_count(conn)}")
     print("\n📋 All records:")
-    all_records = get_all_records(conn)
-    for record in all_records:
+    for record in iter_records(conn):
         record_id, timestamp, data, record_hash = record
         print(f"   ID {record_id}: {data}")
         print(f"      Timestamp: {timestamp}")
-        print(f"      Hash: {record_hash[:16]}...{record_hash[-16:]}")
+        print(f"      Hash: {short_hash(record_hash)}")
     
     # Clean up
     conn.close()
@@ -69,7 +68,7 @@ def demo_merkle_operations():
     
     print(f"Input hashes ({len(test_hashes)}):")
     for i, h in enumerate(test_hashes):
-        print(f"   {i}: {h[:16]}...{h[-16:]}")
+        print(f"   {i}: {short_hash(h)}")
     
     merkle_root_hash = compute_merkle_root(test_hashes)
     print(f"\nMerkle root: {merkle_root_hash}")
@@ -79,7 +78,7 @@ def demo_merkle_operations():
     proof = get_merkle_path(test_hashes, 1)
     print(f"Proof path ({len(proof)} hashes):")
     for i, hash_val in enumerate(proof):
-        print(f"   {i}: {hash_val[:16]}...{hash_val[-16:]}")
+        print(f"   {i}: {short_hash(hash_val)}")
     
     # Example 3: Working with a SQLite ledger
     print(f"\n💾 Example 3: Computing Merkle root from SQLite ledger")
@@ -96,8 +95,7 @@ def demo_merkle_operations():
     ]
     
     print("Adding records to ledger:")
-    for data in test_data:
-        record_id = add_record(conn, data)
+    for record_id, data in zip(add_records(conn, test_data), test_data):
         print(f"   Added record {record_id}: {data}")
     
     # Compute Merkle root from the ledger
@@ -139,8 +137,7 @@ def demo_node_operations():
     ]
     
     print("\n📝 Adding events to node:")
-    for event in events:
-        record_id = node1.add_event(event)
+    for record_id, event in zip(node1.add_events(events), events):
         print(f"   Added event {record_id}: {event}")
     
     # Show node status
@@ -155,8 +152,7 @@ def demo_node_operations():
     node2.initialize()
     
     # Add same events to second node
-    for event in events:
-        node2.add_event(event)
+    node2.add_events(events)
     
     print("Created second node with identical data")
     
@@ -167,8 +163,8 @@ def demo_node_operations():
     print(f"   Node 1 records: {comparison['records_self']}")
     print(f"   Node 2 records: {comparison['records_other']}")
     print(f"   Divergence: {comparison['divergence_type']}")
-    print(f"   Node 1 root: {comparison['root_self'][:16]}...{comparison['root_self'][-16:]}")
-    print(f"   Node 2 root: {comparison['root_other'][:16]}...{comparison['root_other'][-16:]}")
+    print(f"   Node 1 root: {short_hash(comparison['root_self'])}")
+    print(f"   Node 2 root: {short_hash(comparison['root_other'])}")
     
     # Example 3: Network with diverged nodes
     print(f"\n🌐 Example 3: Network with diverged nodes")
@@ -184,8 +180,7 @@ def demo_node_operations():
         "System: Cache cleared"
     ]
     
-    for event in different_events:
-        node3.add_event(event)
+    node3.add_events(different_events)
     
     print("Created third node with different data")
     
@@ -211,9 +206,13 @@ def demo_node_operations():
     with Node("Node-Dave", "dave_ledger.db") as node4:
         node4.add_event("Context manager test event")
         print(f"Node 4 record count: {node4.get_record_count()}")
-        print(f"Node 4 Merkle root: {node4.get_merkle_root()[:16]}...{node4.get_merkle_root()[-16:]}")
+        print(f"Node 4 Merkle root: {short_hash(node4.get_merkle_root())}")
     print("Node 4 automatically closed via context manager")
     
+    # Close the network nodes so SQLite checkpoints and drops its WAL files
+    for node in network:
+        node.close()
+    
     # Clean up example databases
     print(f"\n🧹 Cleaning up example databases...")
     db_files = ["alice_ledger.db", "bob_ledger.db", "charlie_ledger.db", "dave_ledger.db"]
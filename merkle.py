@@ -4,11 +4,74 @@ Merkle tree implementation for computing immutable fingerprints of ledger data.
 This module provides functions to compute Merkle tree roots from SQLite ledger data.
 Merkle trees create a cryptographic fingerprint that changes if any data changes,
 making them perfect for detecting divergence between distributed databases.
+
+Leaves are grouped into fixed-size "twigs" of TWIG_SIZE records. The root of
+every complete twig is cached in the merkle_twigs table, so computing the
+ledger root only hashes the records of the open twig plus one node per twig.
+
+The tree is built with SHA256 by default. Ledgers can instead be created with
+BLAKE3 (requires the optional `blake3` package); the choice is recorded in
+the ledger's ledger_meta table so its roots stay reproducible.
 """
 
 import hashlib
+import os
 import sqlite3
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import blake3
+except ImportError:  # optional dependency
+    blake3 = None
+
+
+# Number of leaves per twig; a power of two so twigs are complete subtrees
+TWIG_SIZE = 2048
+TWIG_HEIGHT = TWIG_SIZE.bit_length() - 1
+
+# Bound once so the hashing loops skip the attribute lookup; hashlib hands raw
+# bytes straight to OpenSSL, which uses the CPU's SHA extensions when present
+_H = hashlib.sha256
+
+
+class HashAlgorithm:
+    """
+    A hash primitive used to build Merkle trees.
+    
+    Attributes:
+        name: Name recorded in a ledger's metadata (e.g. 'sha256')
+        new: Constructor returning a hashlib-style object with digest()
+    """
+    
+    def __init__(self, name: str, new: Callable):
+        self.name = name
+        self.new = new
+    
+    def hash(self, data: bytes) -> bytes:
+        """Return the 32-byte digest of data."""
+        return self.new(data).digest()
+    
+    def __repr__(self):
+        return f"HashAlgorithm(name='{self.name}')"
+
+
+SHA256 = HashAlgorithm('sha256', _H)
+HASH_ALGORITHMS: Dict[str, HashAlgorithm] = {'sha256': SHA256}
+if blake3 is not None:
+    HASH_ALGORITHMS['blake3'] = HashAlgorithm('blake3', blake3.blake3)
+
+# Algorithm used for trees that aren't tied to a ledger
+HASH_ALGO = SHA256
+
+# Record counts above which sealing twigs is spread across processes; below
+# it the cost of starting the pool outweighs the parallel speedup
+_PARALLEL_THRESHOLD = 50_000
+
+# Full twigs handed to a worker per task when sealing in parallel
+_TWIGS_PER_TASK = 8
 
 
 def sha256(data: str) -> str:
@@ -21,45 +84,384 @@ def sha256(data: str) -> str:
     Returns:
         str: Hexadecimal representation of the SHA256 hash
     """
-    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+    return _H(data.encode('utf-8')).hexdigest()
+
+
+def _hash_level(level: List[bytes], algo: HashAlgorithm) -> List[bytes]:
+    """
+    Hash one tree level into its parent level.
+    
+    Each parent is the hash of its two 32-byte children concatenated into a
+    single 64-byte buffer, which measures faster than feeding hashlib the
+    children with two update() calls. Children are paired straight off one
+    iterator, and an odd last child is hashed with itself separately rather
+    than by copying the level to pad it.
+    
+    Args:
+        level: Digests of one tree level (at least two)
+        algo: Hash algorithm to combine children with
+        
+    Returns:
+        List[bytes]: Digests of the parent level
+    """
+    h = algo.new
+    pairs = iter(level)
+    parents = [h(left + right).digest() for left, right in zip(pairs, pairs)]
+    
+    if len(level) & 1:
+        last = level[-1]
+        parents.append(h(last + last).digest())
+    return parents
 
 
-def compute_merkle_root(hashes: List[str]) -> str:
+def compute_merkle_root_bytes(hashes: List[bytes],
+                              algo: Optional[HashAlgorithm] = None) -> bytes:
     """
-    Compute the Merkle root from a list of hashes.
+    Compute the Merkle root from a list of raw 32-byte digests.
     
     This function builds a binary Merkle tree by:
-    1. Taking pairs of hashes and concatenating them
-    2. Computing SHA256 of each concatenated pair
-    3. Repeating until only one hash remains (the root)
+    1. Taking pairs of digests and concatenating them
+    2. Hashing each 64-byte pair (SHA256 unless another algorithm is given)
+    3. Repeating until only one digest remains (the root)
     
-    For odd numbers of hashes, the last hash is duplicated.
+    For odd numbers of digests, the last digest is duplicated. Working on
+    raw digests hashes half as many bytes per node as the hex form and
+    avoids encoding every intermediate value.
     
     Args:
-        hashes: List of hash strings to build the tree from
+        hashes: List of 32-byte digests to build the tree from
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
         
     Returns:
-        str: The Merkle root hash
+        bytes: The 32-byte Merkle root digest
     """
+    algo = algo or HASH_ALGO
+    
     if not hashes:
         # Empty tree - return hash of empty string
-        return sha256("")
+        return algo.hash(b"")
     
-    if len(hashes) == 1:
-        return hashes[0]
+    level = hashes
+    while len(level) > 1:
+        level = _hash_level(level, algo)
     
-    # Build next level by pairing hashes
-    next_level = []
-    for i in range(0, len(hashes), 2):
-        left = hashes[i]
-        right = hashes[i + 1] if i + 1 < len(hashes) else hashes[i]  # Duplicate if odd
+    return level[0]
+
+
+def compute_merkle_root(hashes: List[str], algo: Optional[HashAlgorithm] = None) -> str:
+    """
+    Compute the Merkle root from a list of hex-encoded hashes.
+    
+    This is a thin wrapper around compute_merkle_root_bytes that decodes the
+    input hashes and hex-encodes the resulting root.
+    
+    Args:
+        hashes: List of hex hash strings to build the tree from
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
         
-        # Concatenate and hash
-        combined = left + right
-        next_level.append(sha256(combined))
+    Returns:
+        str: The Merkle root hash
+    """
+    return compute_merkle_root_bytes([bytes.fromhex(h) for h in hashes], algo).hex()
+
+
+def leaf_hash(id_val: int, data: str, algo: Optional[HashAlgorithm] = None) -> bytes:
+    """
+    Compute the Merkle leaf digest for a single ledger record.
+    
+    The leaf includes the record ID for ordering but excludes the timestamp,
+    so identical data added in the same order produces identical roots.
     
-    # Recursively compute root
-    return compute_merkle_root(next_level)
+    Args:
+        id_val: The record's ledger ID
+        data: The record's data
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
+        
+    Returns:
+        bytes: The 32-byte leaf digest
+    """
+    return (algo or HASH_ALGO).hash(f"{id_val}:{data}".encode('utf-8'))
+
+
+def twig_root(leaves: List[bytes], algo: Optional[HashAlgorithm] = None) -> bytes:
+    """
+    Compute the root of a twig from its leaves.
+    
+    Partial twigs are padded up to TWIG_HEIGHT by duplicating their root,
+    which is exactly what the odd-node rule does to the last subtree of a
+    larger tree. This keeps twig-based roots identical to building the tree
+    over every leaf at once.
+    
+    Args:
+        leaves: Between 1 and TWIG_SIZE leaf digests
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
+        
+    Returns:
+        bytes: The 32-byte twig root
+    """
+    algo = algo or HASH_ALGO
+    root = compute_merkle_root_bytes(leaves, algo)
+    for _ in range(TWIG_HEIGHT - (len(leaves) - 1).bit_length()):
+        root = algo.hash(root + root)
+    return root
+
+
+def _fold_twigs(twig_roots: List[bytes], open_leaves: Iterable[bytes],
+                algo: Optional[HashAlgorithm]) -> Tuple[bytes, int]:
+    """
+    Fold leaves into twig roots as they arrive and compute the ledger root.
+    
+    Leaves are consumed TWIG_SIZE at a time and each full twig is reduced to
+    its root straight away, so at most one twig's leaves (about 150 KB,
+    small enough to stay in L2) are alive however many leaves are streamed.
+    
+    Args:
+        twig_roots: Roots of the sealed twigs, in order
+        open_leaves: Leaf digests of every record after the last sealed twig
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
+        
+    Returns:
+        Tuple[bytes, int]: The 32-byte Merkle root and the number of leaves
+        consumed from open_leaves
+    """
+    roots = list(twig_roots)
+    leaves = iter(open_leaves)
+    leaf_count = 0
+    
+    while True:
+        chunk = list(islice(leaves, TWIG_SIZE))
+        leaf_count += len(chunk)
+        if len(chunk) < TWIG_SIZE:
+            break
+        roots.append(twig_root(chunk, algo))
+    
+    if not roots:
+        # The whole ledger fits in one partial twig, so no padding applies
+        return compute_merkle_root_bytes(chunk, algo), leaf_count
+    
+    if chunk:
+        roots.append(twig_root(chunk, algo))
+    return compute_merkle_root_bytes(roots, algo), leaf_count
+
+
+def combine_twigs(twig_roots: List[bytes], open_leaves: Iterable[bytes],
+                  algo: Optional[HashAlgorithm] = None) -> bytes:
+    """
+    Compute the ledger root from sealed twig roots and the remaining leaves.
+    
+    Args:
+        twig_roots: Roots of the sealed twigs, in order
+        open_leaves: Leaf digests of every record after the last sealed twig;
+            any iterable, consumed one twig at a time
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
+        
+    Returns:
+        bytes: The 32-byte Merkle root digest
+    """
+    return _fold_twigs(twig_roots, open_leaves, algo)[0]
+
+
+def get_hash_algorithm(name: str) -> HashAlgorithm:
+    """
+    Look up a Merkle hash algorithm by name.
+    
+    Args:
+        name: 'sha256' or 'blake3'
+        
+    Returns:
+        HashAlgorithm: The matching algorithm
+        
+    Raises:
+        ValueError: If the name is not a known algorithm
+        RuntimeError: If the algorithm's optional package is not installed
+    """
+    if name in HASH_ALGORITHMS:
+        return HASH_ALGORITHMS[name]
+    if name == 'blake3':
+        raise RuntimeError("BLAKE3 support requires the optional 'blake3' package")
+    raise ValueError(f"Unknown hash algorithm '{name}'")
+
+
+def ledger_hash_algorithm(conn: sqlite3.Connection) -> HashAlgorithm:
+    """
+    Get the Merkle hash algorithm a ledger was created with.
+    
+    Args:
+        conn: SQLite database connection to the ledger
+        
+    Returns:
+        HashAlgorithm: The ledger's algorithm; SHA256 for ledgers that
+        predate the ledger_meta table
+    """
+    try:
+        row = conn.execute("SELECT value FROM ledger_meta WHERE key = 'hash_algo'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    return get_hash_algorithm(row[0]) if row else SHA256
+
+
+def load_twigs(conn: sqlite3.Connection) -> Tuple[List[bytes], int]:
+    """
+    Load the sealed twig roots of a ledger.
+    
+    Args:
+        conn: SQLite database connection to the ledger
+        
+    Returns:
+        Tuple[List[bytes], int]: The twig roots in order, and the ID of the
+        last record covered by them (0 if no twig is sealed yet)
+    """
+    twig_roots = []
+    last_id = 0
+    for root, twig_last_id in conn.execute("""
+        SELECT root, last_id
+        FROM merkle_twigs
+        ORDER BY twig_id
+    """):
+        twig_roots.append(root)
+        last_id = twig_last_id
+    return twig_roots, last_id
+
+
+def iter_open_leaves(conn: sqlite3.Connection, after_id: int,
+                     algo: Optional[HashAlgorithm] = None) -> Iterator[bytes]:
+    """
+    Yield the leaf digests of every record after a given ID.
+    
+    Rows are hashed straight off the cursor one at a time, so the records
+    are never materialized in Python.
+    
+    Args:
+        conn: SQLite database connection to the ledger
+        after_id: Only records with a greater ID are hashed
+        algo: Hash algorithm to use (defaults to the ledger's algorithm)
+        
+    Yields:
+        bytes: The leaf digests, in ledger order
+    """
+    algo = algo or ledger_hash_algorithm(conn)
+    
+    # Stream records in order, fetching only the columns the leaves depend on
+    cursor = conn.execute("""
+        SELECT id, data
+        FROM ledger
+        WHERE id > ?
+        ORDER BY id
+    """, (after_id,))
+    
+    for id_val, data in cursor:
+        yield leaf_hash(id_val, data, algo)
+
+
+def load_open_leaves(conn: sqlite3.Connection, after_id: int,
+                     algo: Optional[HashAlgorithm] = None) -> List[bytes]:
+    """
+    Compute the leaf digests of every record after a given ID.
+    
+    Args:
+        conn: SQLite database connection to the ledger
+        after_id: Only records with a greater ID are hashed
+        algo: Hash algorithm to use (defaults to the ledger's algorithm)
+        
+    Returns:
+        List[bytes]: The leaf digests, in ledger order
+    """
+    return list(iter_open_leaves(conn, after_id, algo))
+
+
+def seal_twigs(conn: sqlite3.Connection) -> int:
+    """
+    Cache the roots of any complete twigs that are not sealed yet.
+    
+    Pending rows are streamed off one cursor a twig at a time. When more
+    than _PARALLEL_THRESHOLD records are pending (e.g. init_db opening a
+    large ledger that predates the twig cache), the twigs are hashed across
+    a process pool, a bounded number of twigs per round.
+    
+    The new twig rows are written in the caller's transaction; committing
+    is left to the caller.
+    
+    Args:
+        conn: SQLite database connection to the ledger
+        
+    Returns:
+        int: Number of twigs sealed
+    """
+    algo = ledger_hash_algorithm(conn)
+    twig_id, last_id = conn.execute("""
+        SELECT COUNT(*), COALESCE(MAX(last_id), 0)
+        FROM merkle_twigs
+    """).fetchone()
+    
+    pending = conn.execute(
+        "SELECT COUNT(*) FROM ledger WHERE id > ?", (last_id,)
+    ).fetchone()[0] // TWIG_SIZE
+    if not pending:
+        return 0
+    
+    # Only read as many rows as fill complete twigs
+    cursor = conn.execute("""
+        SELECT id, data
+        FROM ledger
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (last_id, pending * TWIG_SIZE))
+    twigs = iter(lambda: cursor.fetchmany(TWIG_SIZE), [])
+    
+    if pending * TWIG_SIZE > _PARALLEL_THRESHOLD and (os.cpu_count() or 1) > 1:
+        sealed_twigs = _seal_parallel(twigs, algo)
+    else:
+        sealed_twigs = ((_seal_root(rows, algo), rows[-1][0]) for rows in twigs)
+    
+    for root, twig_last_id in sealed_twigs:
+        conn.execute("""
+            INSERT INTO merkle_twigs (twig_id, root, last_id)
+            VALUES (?, ?, ?)
+        """, (twig_id, root, twig_last_id))
+        twig_id += 1
+    return pending
+
+
+def _seal_root(rows: List[Tuple[int, str]], algo: HashAlgorithm) -> bytes:
+    """Compute the twig root of a full twig's (id, data) rows."""
+    return twig_root([leaf_hash(id_val, data, algo) for id_val, data in rows], algo)
+
+
+def _seal_roots(algo_name: str, twigs: List[List[Tuple[int, str]]]) -> List[bytes]:
+    """Compute the twig roots of several full twigs (runs in a worker)."""
+    algo = HASH_ALGORITHMS[algo_name]
+    return [_seal_root(rows, algo) for rows in twigs]
+
+
+def _seal_parallel(twigs: Iterator[List[Tuple[int, str]]],
+                   algo: HashAlgorithm) -> Iterator[Tuple[bytes, int]]:
+    """
+    Compute twig roots across one worker process per CPU.
+    
+    Twigs are read in rounds of _TWIGS_PER_TASK per worker, so only one
+    round of rows is held in memory at a time.
+    
+    Args:
+        twigs: Full twigs of (id, data) rows, in ledger order
+        algo: Hash algorithm to use
+        
+    Yields:
+        Tuple[bytes, int]: Each twig's root and the ID of its last record
+    """
+    workers = os.cpu_count() or 1
+    # Workers look the algorithm up by name, which pickles cheaply
+    seal = partial(_seal_roots, algo.name)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(twigs, workers * _TWIGS_PER_TASK))
+            if not batch:
+                return
+            tasks = [batch[i:i + _TWIGS_PER_TASK] for i in range(0, len(batch), _TWIGS_PER_TASK)]
+            roots = [root for task_roots in executor.map(seal, tasks) for root in task_roots]
+            for root, rows in zip(roots, batch):
+                yield root, rows[-1][0]
 
 
 def merkle_root(conn: sqlite3.Connection) -> str:
@@ -67,9 +469,12 @@ def merkle_root(conn: sqlite3.Connection) -> str:
     Compute the Merkle root for all records in the ledger.
     
     This function:
-    1. Retrieves all records from the ledger in order
-    2. Creates a hash for each record (using id, timestamp, data, and hash)
-    3. Computes the Merkle tree root from these hashes
+    1. Loads the cached roots of the sealed twigs
+    2. Hashes the records after the last sealed twig (using id and data)
+    3. Computes the Merkle tree root over the twig roots
+    
+    The result is identical to building the tree over every record, but only
+    the open twig's records are read and hashed.
     
     The Merkle root serves as a cryptographic fingerprint of the entire ledger.
     Any change to any record will result in a different root.
@@ -80,32 +485,48 @@ def merkle_root(conn: sqlite3.Connection) -> str:
     Returns:
         str: The Merkle root hash representing the entire ledger state
     """
-    # Get all records in order
-    cursor = conn.execute("""
-        SELECT id, timestamp, data, hash
-        FROM ledger
-        ORDER BY id
-    """)
-    
-    records = cursor.fetchall()
+    return root_and_count(conn)[0]
+
+
+def root_and_count(conn: sqlite3.Connection) -> Tuple[str, int]:
+    """
+    Compute the Merkle root and the record count of the ledger together.
     
-    if not records:
-        # Empty ledger - return hash of empty string
-        return sha256("")
+    Every sealed twig holds exactly TWIG_SIZE records, so the count falls
+    out of the same pass that hashes the open twig's records, saving a
+    separate COUNT(*) over the ledger. Unsealed records are streamed one
+    row at a time by iter_open_leaves and folded into twig roots as they
+    arrive, so memory is bounded by one twig of leaves plus one root per
+    twig, however many records are unsealed.
     
-    # Create a hash for each record
-    record_hashes = []
-    for record in records:
-        id_val, _, data, _ = record
+    Args:
+        conn: SQLite database connection to the ledger
         
-        # Create a composite hash that includes record order and data
-        # We include ID for ordering but exclude timestamp to allow identical data
-        # to produce identical roots when added in the same order
-        composite_data = f"{id_val}:{data}"
-        record_hashes.append(sha256(composite_data))
+    Returns:
+        Tuple[str, int]: The Merkle root hash and the number of records
+    """
+    algo = ledger_hash_algorithm(conn)
+    twig_roots, last_id = load_twigs(conn)
+    root, open_count = _fold_twigs(twig_roots, iter_open_leaves(conn, last_id, algo), algo)
+    return root.hex(), len(twig_roots) * TWIG_SIZE + open_count
+
+
+def short_hash(h: Union[bytes, str]) -> str:
+    """
+    Abbreviate a hash for display as its first and last 8 bytes.
     
-    # Compute Merkle root
-    return compute_merkle_root(record_hashes)
+    Raw digests only have their head and tail hex-encoded, so the middle of
+    the hash is never formatted.
+    
+    Args:
+        h: A raw digest or a hex hash string
+        
+    Returns:
+        str: The abbreviated hash, e.g. '70a63d0d2a762b4d...f4d64b4ee1c830fa'
+    """
+    if isinstance(h, bytes):
+        return f"{h[:8].hex()}...{h[-8:].hex()}"
+    return f"{h[:16]}...{h[-16:]}"
 
 
 def compare_merkle_roots(root1: str, root2: str) -> bool:
@@ -122,51 +543,135 @@ def compare_merkle_roots(root1: str, root2: str) -> bool:
     return root1 == root2
 
 
-def get_merkle_path(hashes: List[str], target_index: int) -> List[str]:
+class MerkleHeap:
+    """
+    A complete Merkle tree stored in one heap-ordered buffer.
+    
+    Node k lives at bytes [32k, 32k + 32) of a single bytearray, with its
+    children at 2k and 2k + 1 and the root at 1. Leaves start at the next
+    power of two m >= n. Building happens in place, level by level, without
+    allocating a list per level, and any number of proofs can then be read
+    off the buffer by walking i ^ 1 up from the leaf.
+    
+    Odd levels are padded by copying their last node into the slot next to
+    it, which is the same odd-node rule compute_merkle_root_bytes applies,
+    so the root matches it exactly. (Padding the leaves up to m with copies
+    of the last leaf would not: it changes the root for e.g. 6 leaves.)
+    
+    The in-place build is slower than the list-based level loop, so this
+    only pays off when many proofs are drawn from one tree; a single proof
+    is cheaper with get_merkle_path.
+    """
+    
+    def __init__(self, hashes: List[bytes], algo: Optional[HashAlgorithm] = None):
+        """
+        Build the tree.
+        
+        Args:
+            hashes: The 32-byte leaf digests (at least one)
+            algo: Hash algorithm to use (defaults to HASH_ALGO)
+            
+        Raises:
+            ValueError: If hashes is empty
+        """
+        if not hashes:
+            raise ValueError("A Merkle tree needs at least one leaf")
+        
+        h = (algo or HASH_ALGO).new
+        n = len(hashes)
+        m = 1 << (n - 1).bit_length()
+        tree = bytearray(64 * m)
+        tree[32 * m:32 * (m + n)] = b"".join(hashes)
+        view = memoryview(tree)
+        
+        base, count = m, n
+        while count > 1:
+            if count & 1:
+                # Duplicate the last node of an odd level into its sibling slot
+                last = 32 * (base + count - 1)
+                tree[last + 32:last + 64] = view[last:last + 32]
+                count += 1
+            
+            # Each parent hashes its two adjacent 32-byte children in one slice
+            parent = base >> 1
+            for j in range(count >> 1):
+                child = 32 * (base + 2 * j)
+                node = 32 * (parent + j)
+                tree[node:node + 32] = h(view[child:child + 64]).digest()
+            base, count = parent, count >> 1
+        
+        self.leaf_count = n
+        self._leaf_base = m
+        self._tree = tree
+    
+    def _node(self, k: int) -> bytes:
+        return bytes(self._tree[32 * k:32 * k + 32])
+    
+    def root(self) -> bytes:
+        """Return the 32-byte Merkle root."""
+        return self._node(1)
+    
+    def path(self, target_index: int) -> List[bytes]:
+        """
+        Return the sibling digests from a leaf up to the root.
+        
+        Args:
+            target_index: Index of the leaf to prove
+            
+        Returns:
+            List[bytes]: The proof path, leaf level first
+            
+        Raises:
+            ValueError: If target_index is not in [0, leaf_count)
+        """
+        if not 0 <= target_index < self.leaf_count:
+            raise ValueError(
+                f"Leaf index {target_index} out of range for {self.leaf_count} leaves"
+            )
+        
+        proof = []
+        k = self._leaf_base + target_index
+        while k > 1:
+            proof.append(self._node(k ^ 1))
+            k >>= 1
+        return proof
+
+
+def get_merkle_path(hashes: List[str], target_index: int,
+                    algo: Optional[HashAlgorithm] = None) -> List[str]:
     """
     Get the Merkle path (proof) for a specific record.
     
     This function computes the hashes needed to prove that a specific record
-    is part of the Merkle tree without revealing the entire tree.
+    is part of the Merkle tree without revealing the entire tree. Each level
+    only contributes the target's sibling, picked with index ^ 1 rather than
+    by scanning the level for the target's pair.
     
     Args:
         hashes: List of hashes in the tree
         target_index: Index of the record to prove
+        algo: Hash algorithm to use (defaults to HASH_ALGO)
         
     Returns:
         List[str]: List of hashes forming the proof path
     """
-    if not hashes or target_index >= len(hashes):
+    if not hashes or not 0 <= target_index < len(hashes):
         return []
     
     if len(hashes) == 1:
         return []
     
+    algo = algo or HASH_ALGO
     proof = []
-    current_hashes = hashes[:]
-    current_index = target_index
+    level = [bytes.fromhex(h) for h in hashes]
+    index = target_index
     
-    while len(current_hashes) > 1:
-        next_level = []
-        
-        for i in range(0, len(current_hashes), 2):
-            left = current_hashes[i]
-            right = current_hashes[i + 1] if i + 1 < len(current_hashes) else left
-            
-            # Add to proof if this pair contains our target
-            if i == current_index or (i + 1 == current_index and i + 1 < len(current_hashes)):
-                if current_index == i:
-                    proof.append(right)  # Add sibling
-                else:
-                    proof.append(left)   # Add sibling
-            
-            combined = left + right
-            next_level.append(sha256(combined))
+    while len(level) > 1:
+        # The sibling is the other half of the pair; the last odd node pairs with itself
+        sibling = index ^ 1
+        proof.append(level[sibling if sibling < len(level) else index].hex())
         
-        # Update index for next level
-        current_index = current_index // 2
-        current_hashes = next_level
+        level = _hash_level(level, algo)
+        index >>= 1
     
     return proof
-
-
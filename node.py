@@ -7,10 +7,16 @@ Merkle root computation, and peer comparison.
 """
 
 import sqlite3
+from collections import defaultdict
 from typing import Optional, Dict, Any
 
-from ledger import init_db, add_record, get_all_records, get_record_count
-from merkle import merkle_root, compare_merkle_roots
+from ledger import (
+    init_db, add_record, add_records, get_all_records, get_latest_records, get_record_count
+)
+from merkle import (
+    TWIG_SIZE, SHA256, leaf_hash, combine_twigs, load_twigs, load_open_leaves,
+    ledger_hash_algorithm, compare_merkle_roots, short_hash
+)
 
 
 class Node:
@@ -19,20 +25,33 @@ class Node:
     
     Each node maintains its own SQLite database as an immutable ledger
     and can compute Merkle roots for comparison with other nodes.
+    
+    The node keeps the sealed twig roots and the leaves of the open twig in
+    memory, so computing its Merkle root doesn't touch the database. The
+    cache assumes this node is the only writer to its ledger.
     """
     
-    def __init__(self, name: str, db_file: str):
+    def __init__(self, name: str, db_file: str, hash_algo: Optional[str] = None):
         """
         Initialize a new node.
         
         Args:
             name: Human-readable name for this node
             db_file: Path to the SQLite database file
+            hash_algo: Merkle hash algorithm for a new ledger (see init_db)
         """
         self.name = name
         self.db_file = db_file
+        self.hash_algo = hash_algo
         self.connection: Optional[sqlite3.Connection] = None
         self._is_initialized = False
+        self._hash = SHA256
+        self._twig_roots: list[bytes] = []
+        self._open_leaves: list[bytes] = []
+        # Bumped on every write; the cached root is valid for one generation
+        self._generation = 0
+        self._root_cache: Optional[str] = None
+        self._root_generation = -1
     
     def initialize(self) -> 'Node':
         """
@@ -44,10 +63,43 @@ class Node:
         if self._is_initialized:
             return self
             
-        self.connection = init_db(self.db_file)
+        self.connection = init_db(self.db_file, self.hash_algo)
+        self._hash = ledger_hash_algorithm(self.connection)
+        self._load_merkle_state()
         self._is_initialized = True
         return self
     
+    def _load_merkle_state(self):
+        """Reload the twig roots and open-twig leaves from the database."""
+        self._twig_roots, last_id = load_twigs(self.connection)
+        self._open_leaves = load_open_leaves(self.connection, last_id, self._hash)
+        self._generation += 1
+    
+    def _track_leaves(self, record_ids: list[int], datas: list[str]):
+        """Add newly inserted records to the in-memory open twig."""
+        if not record_ids:
+            return
+        
+        self._generation += 1
+        if record_ids[-1] // TWIG_SIZE > (record_ids[0] - 1) // TWIG_SIZE:
+            # add_record(s) sealed the completed twigs; pick up their roots and
+            # only hash the records after the last one, which are all in this batch
+            self._twig_roots, last_id = load_twigs(self.connection)
+            start = last_id - record_ids[0] + 1
+            record_ids, datas = record_ids[start:], datas[start:]
+            self._open_leaves = []
+        
+        self._open_leaves.extend(
+            leaf_hash(record_id, data, self._hash) for record_id, data in zip(record_ids, datas)
+        )
+    
+    def _cached_root(self) -> str:
+        """Return the Merkle root, recomputing it only after a write."""
+        if self._root_generation != self._generation:
+            self._root_cache = combine_twigs(self._twig_roots, self._open_leaves, self._hash).hex()
+            self._root_generation = self._generation
+        return self._root_cache
+    
     def add_event(self, data: str) -> int:
         """
         Add a new event to this node's ledger.
@@ -64,12 +116,37 @@ class Node:
         if not self._is_initialized:
             raise RuntimeError(f"Node {self.name} is not initialized. Call initialize() first.")
         
-        return add_record(self.connection, data)
+        record_id = add_record(self.connection, data)
+        self._track_leaves([record_id], [data])
+        return record_id
+    
+    def add_events(self, events: list[str]) -> list[int]:
+        """
+        Add several events to this node's ledger in one transaction.
+        
+        Args:
+            events: The event data to record, in order
+            
+        Returns:
+            list[int]: The IDs of the inserted records
+            
+        Raises:
+            RuntimeError: If node is not initialized
+        """
+        if not self._is_initialized:
+            raise RuntimeError(f"Node {self.name} is not initialized. Call initialize() first.")
+        
+        record_ids = add_records(self.connection, events)
+        self._track_leaves(record_ids, events)
+        return record_ids
     
     def get_merkle_root(self) -> str:
         """
         Compute the Merkle root for this node's ledger.
         
+        The root is computed from the cached twig roots and open-twig leaves,
+        and memoized until the next event is added.
+        
         Returns:
             str: The Merkle root hash
             
@@ -79,7 +156,24 @@ class Node:
         if not self._is_initialized:
             raise RuntimeError(f"Node {self.name} is not initialized. Call initialize() first.")
         
-        return merkle_root(self.connection)
+        return self._cached_root()
+    
+    def get_root_and_count(self) -> tuple[str, int]:
+        """
+        Get the Merkle root and record count of this node's ledger together.
+        
+        Both come from the cached twig state, so no ledger query is needed.
+        
+        Returns:
+            tuple[str, int]: The Merkle root hash and the number of records
+            
+        Raises:
+            RuntimeError: If node is not initialized
+        """
+        if not self._is_initialized:
+            raise RuntimeError(f"Node {self.name} is not initialized. Call initialize() first.")
+        
+        return self._cached_root(), len(self._twig_roots) * TWIG_SIZE + len(self._open_leaves)
     
     def get_record_count(self) -> int:
         """
@@ -101,7 +195,8 @@ class Node:
         Get all records from this node's ledger.
         
         Returns:
-            list[tuple]: List of (id, timestamp, data, hash) tuples
+            list[tuple]: List of (id, timestamp, data, hash) tuples, with the
+            hash as a 32-byte digest
             
         Raises:
             RuntimeError: If node is not initialized
@@ -132,10 +227,8 @@ class Node:
         if not other._is_initialized:  # pylint: disable=protected-access
             raise RuntimeError(f"Node {other.name} is not initialized. Call initialize() first.")
         
-        root_self = self.get_merkle_root()
-        root_other = other.get_merkle_root()
-        records_self = self.get_record_count()
-        records_other = other.get_record_count()
+        root_self, records_self = self.get_root_and_count()
+        root_other, records_other = other.get_root_and_count()
         
         identical = compare_merkle_roots(root_self, root_other)
         
@@ -173,16 +266,15 @@ class Node:
                 'status': 'Not initialized'
             }
         
-        records = self.get_all_records()
-        merkle_root_hash = self.get_merkle_root()
+        merkle_root_hash, record_count = self.get_root_and_count()
         
         return {
             'name': self.name,
             'db_file': self.db_file,
             'initialized': True,
-            'record_count': len(records),
+            'record_count': record_count,
             'merkle_root': merkle_root_hash,
-            'latest_records': [record[2] for record in records[-3:]],  # Last 3 record data
+            'latest_records': get_latest_records(self.connection, 3),  # Last 3 record data
             'status': 'Active'
         }
     
@@ -196,7 +288,7 @@ class Node:
         
         if status['initialized']:
             print(f"   Records: {status['record_count']}")
-            print(f"   Merkle Root: {status['merkle_root'][:16]}...{status['merkle_root'][-16:]}")
+            print(f"   Merkle Root: {short_hash(status['merkle_root'])}")
             
             if status['latest_records']:
                 print("   Recent Records:")
@@ -211,6 +303,10 @@ class Node:
             self.connection.close()
             self.connection = None
             self._is_initialized = False
+            self._twig_roots = []
+            self._open_leaves = []
+            self._root_cache = None
+            self._root_generation = -1
     
     def __enter__(self):
         """Context manager entry."""
@@ -263,23 +359,11 @@ def compare_network(nodes: list[Node]) -> Dict[str, Any]:
     for node in nodes:
         roots[node.name] = node.get_merkle_root()
     
-    # Find sync groups
-    sync_groups = []
-    processed_nodes = set()
-    
+    # Find sync groups by bucketing nodes on their root
+    groups = defaultdict(list)
     for node_name, root in roots.items():
-        if node_name in processed_nodes:
-            continue
-            
-        # Find all nodes with the same root
-        sync_group = [node_name]
-        for other_node, other_root in roots.items():
-            if other_node != node_name and other_root == root:
-                sync_group.append(other_node)
-                processed_nodes.add(other_node)
-        
-        processed_nodes.add(node_name)
-        sync_groups.append(sync_group)
+        groups[root].append(node_name)
+    sync_groups = list(groups.values())
     
     # Calculate statistics
     total_nodes = len(nodes)